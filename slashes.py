@@ -5,6 +5,9 @@ try: input = raw_input              #
 except NameError: pass              #
 #####################################
 
+import io
+import re
+
 
 
 ### INTRODUCTION ###############################################################
@@ -43,12 +46,14 @@ except NameError: pass              #
 #
 #   ## Output
 #
-#   The interpreter returns a generator function that yields the output one
-#   character at a time. You can use:
+#   The interpreter returns a generator function that yields the output in
+#   chunks (each one a string with all the characters printed before the next
+#   substitution). You can use:
 #
 #       output = "".join(slashes(code_to_execute))
 #
-#   to obtain the whole output as a single string.
+#   to obtain the whole output as a single string, or simply call the function
+#   `slashes_str(string, verbose=0, color=0)` that does exactly that.
 #
 #
 #   ---------------------------------------------------------------------------
@@ -179,80 +184,248 @@ except NameError: pass              #
 
 ### /// INTERPRETER ############################################################
 
+# The Pattern and Replacement of a step (the fields between three unescaped
+# "/") over the UTF-8 encoded program (since "/" and "\" never appear inside
+# a multi-byte character, the result is exactly the same as over the text):
+_FIELD = br"([^/\\]*(?:\\.[^/\\]*)*)"
+_RULE  = re.compile(b"/"+_FIELD+b"/"+_FIELD+b"/", re.DOTALL)
+
+# The byte of "\" (indexing a bytearray gives the number of the byte):
+_BSLASH = ord(b"\\")
+
+def _split(data):
+
+    # Find the fist unescaped "/" (the ones preceded by an odd number of "\"
+    # are escaped) and split the step into Output, Pattern and Replacement
+    # (the last two are None if there are less than three unescaped "/"):
+    i = data.find(b"/")
+    while i > 0 and data[i-1] == _BSLASH:
+        j = i-1
+        while j > 0 and data[j-1] == _BSLASH: j -= 1
+        if (i-j) % 2 == 0: break
+        i = data.find(b"/", i+1)
+    if i < 0: i = len(data)
+
+    # (Python 2 matches over a bytearray return bytearrays, which can not be
+    # used as keys of the rules cache, so the Pattern and Replacement are
+    # always returned as bytes):
+    rule = _RULE.match(data, i)
+    if not rule: return _unescape(data[:i]), None, None, len(data)
+    pat, rep = rule.groups()
+    return (_unescape(data[:i]), bytes(_unescape(pat)), bytes(_unescape(rep)),
+            rule.end())
+
+def _unescape(field):
+
+    # Every "\" of a field escapes the next byte, so the escaped "\" are the
+    # leftmost pairs "\\" and the remaining ones can simply be removed
+    # (joining with a bytearray also accepts the bytearray parts of Python 2):
+    if b"\\" not in field: return field
+    parts = field.split(b"\\\\")
+    return bytearray(b"\\").join(part.replace(b"\\", b"") for part in parts)
+
+# The compiled search of each rule, whether all its Substitutions can be done
+# at once and how far back a new occurrence can start (since the programs keep
+# reusing the same rules, up to 256 short ones are cached, and the cache is
+# emptied when it is full). Compiling a literal Pattern also builds its KMP
+# failure table, so it is only computed once:
+_RULES = {}
+
+def _rule(pat, rep):
+    # (a single lookup, since another thread may empty the cache meanwhile):
+    rule = _RULES.get((pat, rep))
+    if rule is not None: return rule
+    rule = (re.compile(re.escape(pat)).search,
+            _at_once(pat, rep),
+            len(pat)-1 if pat else 0)
+    if len(pat) + len(rep) <= 256:
+        if len(_RULES) >= 256: _RULES.clear()
+        _RULES[pat, rep] = rule
+    return rule
+
+# The longest ends of a Pattern compared against its Replacement (checking for
+# overlaps costs the square of the shorter of the two, so when both are longer
+# the rule is done one Substitution at a time, which is slower if the Pattern
+# appears very often but keeps the check bounded):
+_OVERLAP = 64
+
+def _at_once(pat, rep):
+
+    # All the Substitutions can be done at once if no new occurrence of the
+    # Pattern can overlap an inserted Replacement: neither inside it, nor
+    # around it, nor starting or ending in it (and, if the Replacement is
+    # empty, nor across the gap left by the Pattern):
+    if not pat or pat in rep: return False
+    if not rep:               return len(pat) == 1
+    if rep in pat:            return False
+    if min(len(pat), len(rep)) > _OVERLAP: return False
+
+    # (only the ends of the Pattern that fit inside the Replacement matter):
+    return not any(rep.endswith(pat[:k]) or rep.startswith(pat[-k:])
+                   for k in range(1, min(len(pat), len(rep)+1)))
+
+# Text runs over its UTF-8 encoding ("surrogatepass" keeps any lone surrogate
+# of Python 3 text, and Python 2 already encodes them) while a Python 2 str is
+# already a byte string, so it runs as it is and its output is also a str:
+_ERRORS = "strict" if str is bytes else "surrogatepass"
+
+def _encode(string):
+    if isinstance(string, bytes): return bytearray(string), bytes
+    return (bytearray(string.encode("utf-8", _ERRORS)),
+            lambda data: data.decode("utf-8", _ERRORS))
+
 def slashes(string, verbose=0, color=0):
 
+    # Without Debug Info: use the fast interpreter
+    if verbose <= 0: return _slashes_fast(string)
+    else:            return _slashes_debug(string, verbose, color)
+
+
+def slashes_str(string, verbose=0, color=0):
+
+    # Run the whole program and return its output as a single string:
+    return "".join(slashes(string, verbose, color))
+
+
+def _slashes_fast(string):
+
+    # Work in place over the UTF-8 encoded program:
+    data, text = _encode(string)
+
+    # Bind everything used in the hot loop to locals (see PEP 659):
+    split, rule = _split, _rule
+
+    while data:
+
+        # Split the next step and output whatever appears before the fist "/":
+        out, pat, rep, end = split(data)
+        if out: yield text(out)
+
+        # If there are less than three unescaped "/": halt
+        if rep is None: break
+
+        # Otherwise: perform as many Substitutions as possible
+        del data[:end]
+
+        # Nothing to do unless the Pattern appears in the rest of the program
+        # (so an absent Pattern costs a single scan, and no rule is built):
+        i = data.find(pat)
+        if i < 0: continue
+        search, at_once, back = rule(pat, rep)
+
+        if at_once:
+            # Single-byte rules swap the global replace for a table lookup:
+            if len(pat) == 1 and len(rep) == 1:
+                table = bytearray(range(256))
+                table[ord(pat)] = ord(rep)
+                data = data.translate(table)
+            elif len(pat) == 1 and not rep:
+                data = data.translate(None, pat)
+            else:
+                data = data.replace(pat, rep)
+
+        # Same-length rules overwrite in place (nothing is moved):
+        elif len(pat) == len(rep):
+            size, found = len(pat), search(data, i)
+            while found:
+                i = found.start()
+                data[i:i+size] = rep
+                found = search(data, i-back if i > back else 0)
+
+        # Otherwise: build the result from left to right, only sending back to
+        # the unread part the bytes that a new occurrence could overlap
+        else:
+            done, size, pos = bytearray(), len(pat), 0
+            found = search(data, i)
+            while found:
+                i = found.start()
+                done += data[pos:i]
+                keep = (done[-back:] if back else b"") + rep
+                if back: del done[-back:]
+                pos  = i+size-len(keep)
+
+                # Leave free room in front of the unread part if it is full
+                # (doubling it, so the cascades that keep growing to the left
+                # only overwrite the bytes they send back, like the others):
+                if pos < 0:
+                    room = max(len(data), len(keep))
+                    data[0:0] = bytearray(room)
+                    i, pos = i+room, pos+room
+                data[pos:i+size] = keep
+                found = search(data, pos)
+            done += data[pos:]
+            data  = done
+
+
+# The Color Schemes of the Debug Info (none, grayscale and bright colors):
+_COLORS = (["/", "/", "/", "\n"],
+           ["\033[0;1m/\033[0;2m"]*3 + ["\033[0m\n"],
+           ["\033[0;2;90m/\033[0;91m",
+            "\033[0;2;90m/\033[0;92m",
+            "\033[0;2;90m/\033[0;96m", "\033[0m\n"])
+
+def _slashes_debug(string, verbose, color):
+
     # Print Debug Info and Set Color Scheme #########################
-    if verbose >  0: output = []; print("INPUT:  " + string + "\n") #
-    if   color <= 0: X = ["/", "/", "/", "\n"]                      #
-    elif color == 1: X = ["\033[0;1m/\033[0;2m"]*3 + ["\033[0m\n"]  #
-    elif color >= 2: X = ["\033[0;2;90m/\033[0;91m",                #
-                          "\033[0;2;90m/\033[0;92m",                #
-                          "\033[0;2;90m/\033[0;96m", "\033[0m\n"]   #        
+    output = io.BytesIO(); print("INPUT:  " + string + "\n")        #
+    X = _COLORS[min(max(color, 0), 2)]                              #
     #################################################################
 
-    while string:
-
-        N = len(string)
-
-        # Output whatever appears before the fist unescaped "/":
-        i = 0
-        while i < N:
-            if string[i] == "/" : break
-            if string[i] == "\\": i += 1
-
-            ### Store Debug Info #####################
-            if verbose > 0: output.append(string[i]) #
-            ##########################################
-            
-            yield string[i]
-            i += 1
-
-        # Find the Pattern betwen the fist and the second unescaped "/":
-        i, pattern = i+1, []
-        while i < N:
-            if string[i] == "/" : break
-            if string[i] == "\\": i += 1
-            pattern.append(string[i])
-            i += 1
-
-        # Find the Replacement betwen the second and the third unescaped "/":
-        i, replacement  = i+1, []
-        while i < N:
-            if string[i] == "/" : break
-            if string[i] == "\\": i += 1
-            replacement.append(string[i])
-            i += 1
+    # Select once which Substitution steps print Debug Info:
+    def skip(head, data): pass
+    def main(head, data): _debug(head, text(data), X[3], verbose > 3)
+    def each(head, data): _debug(head, text(data), X[3], verbose > 4)
+    main_step = main if verbose > 1 else skip
+    each_step = each if verbose > 2 else skip
+    all_steps = verbose > 2
+
+    data, text = _encode(string)
+
+    while data:
+
+        # Split the next step and output whatever appears before the fist "/":
+        out, pat, rep, end = _split(data)
+        if out:
+            output.write(out)
+            yield text(out)
 
         # If there are less than three unescaped "/": halt
-        if i >= N: break
+        if rep is None: break
 
         # Otherwise: perform as many Substitutions as possible
-        pat    = "".join(pattern)
-        rep    = "".join(replacement)
-        string = string[i+1:]
-
-        # Print Debug Info ##########################################
-        if verbose > 1:                                             #
-            print("APPLY:  "+X[0]+pat+X[1]+rep+X[2]+string+X[3])    #
-            if verbose > 3:                                         #
-                _ = input("\nPress <Return> to resume execution")   #
-                print("\x1b[1A\x1b[2K\x1b[1A\x1b[2K\x1b[1A")        #
-        #############################################################
-
-        while pat in string:
-            string = string.replace(pat, rep, 1)
-
-            # Print Debug Info ##########################################
-            if verbose > 2:                                             #
-                print("APPLY:  "+X[0]+pat+X[1]+rep+X[2]+string+X[3])    #
-                if verbose > 4:                                         #
-                    _ = input("\nPress <Return> to resume execution")   #
-                    print("\x1b[1A\x1b[2K\x1b[1A\x1b[2K\x1b[1A")        #
-            #############################################################
-
-    # Print Debug Info ##################################
-    if verbose > 0: print("OUTPUT: " + "".join(output)) #
-    #####################################################
+        del data[:end]
+        head = "APPLY:  "+X[0]+text(pat)+X[1]+text(rep)+X[2]
+        main_step(head, data)
+
+        # If no new occurrence of the Pattern can overlap an inserted
+        # Replacement, doing all the Substitutions at once is equivalent:
+        search, at_once, back = _rule(pat, rep)
+        if at_once and not all_steps:
+            data = data.replace(pat, rep)
+
+        # Otherwise: perform them one at a time
+        else:
+            found = search(data)
+            while found:
+                i = found.start()
+                data[i:i+len(pat)] = rep
+                each_step(head, data)
+
+                # Any new occurrence must overlap the Replacement just inserted:
+                found = search(data, max(i-back, 0))
+
+    # Print Debug Info ############################
+    print("OUTPUT: " + text(output.getvalue()))   #
+    ###############################################
+
+
+def _debug(head, data, tail, stop):
+
+    # Print a Substitution step (and wait for the user if asked to):
+    print(head + data + tail)
+    if stop:
+        _ = input("\nPress <Return> to resume execution")
+        print("\x1b[1A\x1b[2K\x1b[1A\x1b[2K\x1b[1A")
 
 ################################################################################
 
@@ -261,14 +434,16 @@ def slashes(string, verbose=0, color=0):
 ### COMPACT /// INTERPRETER ####################################################
 
 def S(s):
-  while s:
+  i = 0
+  while i < len(s):
     b = ["","",1]
     for t in (0,1,2):
-      while s:
-        if s[0] == "/" :      s = s[1:]; break
-        if s[0] == "\\":      s = s[1:]
-        if t: b[t-1] += s[0]; s = s[1:]
-        else: yield     s[0]; s = s[1:]
+      while i < len(s):
+        if s[i] == "/" :      i += 1; break
+        if s[i] == "\\":      i += 1
+        if t: b[t-1] += s[i]; i += 1
+        else: yield     s[i]; i += 1
+    s, i = s[i:], 0
     while s and b[0] in s: s = s.replace(*b)
 
 ################################################################################